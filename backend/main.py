@@ -1,18 +1,31 @@
 import os
+import asyncio
 import gc
-import json
+import csv
 import uuid
 import glob
-import hashlib
+import re
+import functools
+import time
+import sqlite3
+import threading
 import logging
 import shutil
 import subprocess
 import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import anyio
+import ctranslate2
+import numpy as np
+import orjson
 import pikepdf
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from blake3 import blake3
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-import whisper
+from fastapi.responses import FileResponse, ORJSONResponse
+from faster_whisper import BatchedInferencePipeline, WhisperModel
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,10 +34,22 @@ logging.basicConfig(
 )
 log = logging.getLogger("audiolens")
 
-app = FastAPI(title="Audiolens", version="1.0.0")
+# Whisper results may carry numpy scalars
+ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load weights in each worker process (after any fork) before serving
+    await anyio.to_thread.run_sync(load_model)
+    yield
+
+
+app = FastAPI(title="Audiolens", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 MAX_PDF_SIZE = 200 * 1024 * 1024   # 200 MB
 MAX_AUDIO_SIZE = 500 * 1024 * 1024  # 500 MB
+UPLOAD_BUFFER_SIZE = 4 * 1024 * 1024  # reused read buffer for streaming uploads
 
 UPLOAD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "uploads"))
 FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend"))
@@ -33,141 +58,367 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
-JOBS_FILE = os.path.join(UPLOAD_DIR, "jobs.json")
+JOBS_DB = os.path.join(UPLOAD_DIR, "jobs.db")
+LEGACY_JOBS_FILE = os.path.join(UPLOAD_DIR, "jobs.json")
 
 CHUNK_DURATION = 1800  # 30 minutes per chunk
+CHUNKED_THRESHOLD = 2 * 3600  # files longer than 2 hours are split on disk first
+BATCH_SIZE = 8  # VAD segments decoded per batched forward pass
+# Silero VAD settings for the sequential (chunked) path, whose library
+# default only splits on silences of 2 s or more. The batched pipeline keeps
+# its own tighter default (160 ms).
+VAD_PARAMETERS = {"min_silence_duration_ms": 500}
+
+# Whisper backend settings (CTranslate2 already ships fused int8 kernels).
+# WHISPER_DEVICE=auto picks CUDA when a GPU is visible; set it to "cpu" on
+# hosts whose driver is present but lack the cuBLAS/cuDNN libraries.
+# FP16 on GPU, int8 on CPU unless WHISPER_COMPUTE_TYPE says otherwise.
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "tiny")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "auto")
+if WHISPER_DEVICE == "auto":
+    WHISPER_DEVICE = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+WHISPER_COMPUTE_TYPE = os.getenv(
+    "WHISPER_COMPUTE_TYPE", "float16" if WHISPER_DEVICE == "cuda" else "int8"
+)
+# Chunks of long files are transcribed by WHISPER_WORKERS parallel workers
+# with WHISPER_CPU_THREADS threads each; keep workers * threads <= cores.
+# The batched path uses a single worker, so by default that one worker
+# gets every core. Each worker is a full model replica, on GPU as well.
+WHISPER_WORKERS = max(1, int(os.getenv("WHISPER_WORKERS", 1)))
+WHISPER_CPU_THREADS = int(os.getenv(
+    "WHISPER_CPU_THREADS", max(1, (os.cpu_count() or 1) // WHISPER_WORKERS)
+))
+
+db = sqlite3.connect(JOBS_DB, isolation_level=None, check_same_thread=False)
+db.row_factory = sqlite3.Row
+db.execute("PRAGMA journal_mode=WAL")
+db.executescript("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        pdf_url TEXT,
+        audio_url TEXT,
+        title TEXT,
+        etag TEXT,
+        error TEXT,
+        created REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_status_created ON jobs(status, created);
+""")
+# Transcripts are served from their cache file now; databases created
+# before that stored them inline and lack the etag column.
+if "etag" not in {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}:
+    db.execute("ALTER TABLE jobs ADD COLUMN etag TEXT")
+db_lock = threading.Lock()
+
+JOB_COLUMNS = ("status", "pdf_url", "audio_url", "title", "etag", "error")
+
+
+def create_job(job_id, **fields):
+    fields.setdefault("status", "processing")
+    cols = ["id", "created"] + list(fields)
+    values = [job_id, time.time()] + list(fields.values())
+    with db_lock:
+        db.execute(
+            f"INSERT OR REPLACE INTO jobs ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+            values,
+        )
 
-def load_jobs():
-    if os.path.exists(JOBS_FILE):
-        try:
-            with open(JOBS_FILE) as f:
-                return json.load(f)
-        except Exception as e:
-            log.warning("Failed to load jobs file: %s", e)
-    return {}
 
-def save_jobs():
-    with open(JOBS_FILE, "w") as f:
-        json.dump(jobs, f)
+def update_job(job_id, **fields):
+    assert fields and set(fields) <= set(JOB_COLUMNS), fields
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    with db_lock:
+        db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", list(fields.values()) + [job_id])
 
-jobs = load_jobs()
 
-log.info("Loading Whisper model…")
-model = whisper.load_model("tiny")
-log.info("Model loaded.")
+def get_job(job_id):
+    """Return the job as a dict, or None if unknown."""
+    with db_lock:
+        row = db.execute(
+            f"SELECT id, created, {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    return dict(row) if row is not None else None
+
+
+def _import_legacy_jobs():
+    """One-off import of the old jobs.json store into SQLite."""
+    if not os.path.exists(LEGACY_JOBS_FILE):
+        return
+    try:
+        with open(LEGACY_JOBS_FILE, "rb") as f:
+            legacy = orjson.loads(f.read())
+    except Exception as e:
+        log.warning("Failed to load legacy jobs file: %s", e)
+        return
+    with db_lock:
+        # Dict order was insertion order; keep it for /history
+        for created, (job_id, job) in enumerate(legacy.items()):
+            db.execute(
+                "INSERT OR IGNORE INTO jobs (id, status, pdf_url, audio_url, title, error, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, job["status"], job.get("pdf_url"), job.get("audio_url"), job.get("title"),
+                 job.get("error"), created),
+            )
+    os.rename(LEGACY_JOBS_FILE, LEGACY_JOBS_FILE + ".migrated")
+    log.info("Imported %d job(s) from %s.", len(legacy), LEGACY_JOBS_FILE)
+
+
+_import_legacy_jobs()
+
+
+def _content_id(hasher):
+    """32-hex-char content id, the same length as the MD5 names of uploads
+    stored before the switch to BLAKE3. Those legacy files keep their names
+    (and URLs, which the frontend keys resume positions on)."""
+    return hasher.hexdigest(length=16)
+
+
+model = None
+batched_model = None
+
+
+def load_model():
+    """Load the Whisper model once per process."""
+    global model, batched_model
+    if model is not None:
+        return
+    log.info("Loading Whisper model…")
+    model = WhisperModel(
+        WHISPER_MODEL,
+        device=WHISPER_DEVICE,
+        compute_type=WHISPER_COMPUTE_TYPE,
+        cpu_threads=WHISPER_CPU_THREADS,
+        num_workers=WHISPER_WORKERS,
+    )
+    log.info("Model loaded (%s on %s, %s, %d worker(s) x %d thread(s)).",
+             WHISPER_MODEL, WHISPER_DEVICE, WHISPER_COMPUTE_TYPE, WHISPER_WORKERS, WHISPER_CPU_THREADS)
+    batched_model = BatchedInferencePipeline(model=model)
+
+
+
+def _transcribe(audio, batched=False):
+    """Run Whisper on audio and return a {"segments": [...]} dict in the
+    same shape as the on-disk transcript cache.
+
+    With batched=True the file is VAD-split and its speech regions are
+    decoded BATCH_SIZE at a time; timestamps are already global."""
+    if batched:
+        segments_iter, _info = batched_model.transcribe(
+            audio, word_timestamps=True, vad_filter=True, beam_size=1,
+            batch_size=BATCH_SIZE,
+        )
+    else:
+        segments_iter, _info = model.transcribe(
+            audio, word_timestamps=True, vad_filter=True, vad_parameters=VAD_PARAMETERS, beam_size=1,
+        )
+    segments = []
+    for seg in segments_iter:
+        segments.append({
+            "id": seg.id,
+            "start": seg.start,
+            "end": seg.end,
+            "text": seg.text,
+            "words": [
+                {"start": w.start, "end": w.end, "word": w.word, "probability": w.probability}
+                for w in (seg.words or [])
+            ],
+        })
+    return {"segments": segments}
+
+
+@functools.lru_cache(maxsize=1024)
+def _probe_duration(audio_path):
+    """Return duration in seconds via ffprobe; raises on error so failed
+    probes are not memoized. Upload paths are content-addressed, so
+    successful results are safe to cache."""
+    out = subprocess.check_output(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "csv=p=0", audio_path],
+        stderr=subprocess.DEVNULL,
+    )
+    return float(out.strip())
 
 
 def _get_audio_duration(audio_path):
     """Return duration in seconds via ffprobe, or None on error."""
+    try:
+        return _probe_duration(audio_path)
+    except Exception:
+        return None
+
+
+def _get_audio_meta(audio_path, audio_hash):
+    """Return {"duration": ..., "chunked": ...} for an upload, persisted as
+    {audio_hash}.meta.json so re-queued jobs skip ffprobe after a restart."""
+    meta_path = os.path.join(UPLOAD_DIR, f"{audio_hash}.meta.json")
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, "rb") as f:
+                return orjson.loads(f.read())
+        except Exception as e:
+            log.warning("Failed to load %s: %s", meta_path, e)
+    duration = _get_audio_duration(audio_path)
+    meta = {"duration": duration, "chunked": bool(duration and duration > CHUNKED_THRESHOLD)}
+    if duration:
+        with open(meta_path, "wb") as f:
+            f.write(orjson.dumps(meta))
+    return meta
+
+
+def _probe_audio_stream(audio_path):
+    """Return (codec_name, sample_rate, channels) of the first audio stream,
+    or None on error."""
     try:
         out = subprocess.check_output(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-             "-of", "csv=p=0", audio_path],
+            ["ffprobe", "-v", "error", "-select_streams", "a:0",
+             "-show_entries", "stream=codec_name,sample_rate,channels",
+             "-of", "json", audio_path],
             stderr=subprocess.DEVNULL,
         )
-        return float(out.strip())
+        stream = orjson.loads(out)["streams"][0]
+        return stream["codec_name"], int(stream["sample_rate"]), int(stream["channels"])
     except Exception:
         return None
 
 
 def _split_audio(audio_path, chunk_dir, chunk_duration):
     """Split audio_path into chunk_duration-second WAV chunks in chunk_dir.
-    Returns a sorted list of chunk file paths."""
+    Returns a sorted list of chunk file paths. The segment muxer also writes
+    chunks.csv (filename,start,end) with each chunk's exact time range.
+    Sources that are already 16 kHz mono PCM are stream-copied, not re-encoded."""
     os.makedirs(chunk_dir, exist_ok=True)
     pattern = os.path.join(chunk_dir, "chunk_%04d.wav")
+    if _probe_audio_stream(audio_path) == ("pcm_s16le", 16000, 1):
+        codec_args = ["-c:a", "copy"]
+    else:
+        codec_args = ["-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le"]
     subprocess.check_call([
-        "ffmpeg", "-y", "-i", audio_path,
+        "ffmpeg", "-y", "-threads", "0", "-i", audio_path, "-map", "0:a:0",
         "-f", "segment", "-segment_time", str(chunk_duration),
-        "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le",
+        "-segment_list", os.path.join(chunk_dir, "chunks.csv"),
+        "-segment_list_type", "csv",
+        *codec_args,
         pattern,
     ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     chunks = sorted(glob.glob(os.path.join(chunk_dir, "chunk_*.wav")))
     return chunks
 
 
-def _transcribe_chunked(job_id, audio_path, audio_hash):
-    """Split a long audio file into chunks, transcribe each, merge results."""
-    chunk_dir = os.path.join(UPLOAD_DIR, f".chunks_{audio_hash}")
+def _load_wav(wav_path):
+    """Read a 16 kHz mono pcm_s16le WAV chunk into a float32 array in
+    [-1, 1), so Whisper does not spawn its own decoder for it."""
+    with wave.open(wav_path, "rb") as w:
+        pcm = w.readframes(w.getnframes())
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _read_chunk_offsets(chunk_dir):
+    """Return {chunk filename: start time in seconds} from chunks.csv."""
+    with open(os.path.join(chunk_dir, "chunks.csv"), newline="") as f:
+        return {name: float(start) for name, start, _end in csv.reader(f)}
+
+
+def _transcribe_chunked(job_id, audio_path, out_path):
+    """Split a long audio file into chunks, transcribe each, and stream the
+    merged {"segments": [...]} transcript into out_path. Returns the number
+    of segments written."""
+    chunk_dir = os.path.join(UPLOAD_DIR, f".chunks_{job_id}")
     try:
         log.info("[%s] Splitting audio into %ds chunks…", job_id, CHUNK_DURATION)
         chunks = _split_audio(audio_path, chunk_dir, CHUNK_DURATION)
+        offsets = _read_chunk_offsets(chunk_dir)
         log.info("[%s] Created %d chunk(s).", job_id, len(chunks))
 
-        all_segments = []
-        seg_id = 0
-        time_offset = 0.0
-
-        for i, chunk_path in enumerate(chunks):
+        # CTranslate2 releases the GIL, so chunks run concurrently on threads
+        def transcribe_chunk(indexed_chunk):
+            i, chunk_path = indexed_chunk
             log.info("[%s] Transcribing chunk %d/%d…", job_id, i + 1, len(chunks))
-            result = model.transcribe(chunk_path, word_timestamps=True, fp16=False)
-            for seg in result.get("segments", []):
-                seg["start"] += time_offset
-                seg["end"] += time_offset
-                seg["id"] = seg_id
-                # Shift word-level timestamps too
-                for w in seg.get("words", []):
-                    w["start"] += time_offset
-                    w["end"] += time_offset
-                seg_id += 1
-                all_segments.append(seg)
-
-            # Determine actual chunk length for accurate offset
-            chunk_dur = _get_audio_duration(chunk_path)
-            if chunk_dur:
-                time_offset += chunk_dur
-            else:
-                time_offset += CHUNK_DURATION
-
-            # Free memory between chunks
-            del result
-            gc.collect()
+            return _transcribe(_load_wav(chunk_path))
 
-            log.info("[%s] Chunk %d done – %d segment(s) so far.", job_id, i + 1, len(all_segments))
-
-        return {"segments": all_segments}
+        # Segments are written out as each chunk is merged, so only chunks
+        # still waiting to be merged are held in memory.
+        seg_id = 0
+        with open(out_path, "wb") as out, ThreadPoolExecutor(max_workers=WHISPER_WORKERS) as ex:
+            out.write(b'{"segments":[')
+            results = ex.map(transcribe_chunk, enumerate(chunks))
+            for i, (chunk_path, result) in enumerate(zip(chunks, results)):
+                time_offset = offsets[os.path.basename(chunk_path)]
+                for seg in result.get("segments", []):
+                    seg["start"] += time_offset
+                    seg["end"] += time_offset
+                    seg["id"] = seg_id
+                    # Shift word-level timestamps too
+                    for w in seg.get("words", []):
+                        w["start"] += time_offset
+                        w["end"] += time_offset
+                    if seg_id:
+                        out.write(b",")
+                    out.write(orjson.dumps(seg, option=ORJSON_OPTS))
+                    seg_id += 1
+
+                del result
+                gc.collect()
+
+                log.info("[%s] Chunk %d done – %d segment(s) so far.", job_id, i + 1, seg_id)
+            out.write(b"]}")
+
+        return seg_id
     finally:
         # Clean up chunk files
         shutil.rmtree(chunk_dir, ignore_errors=True)
 
 
+def _transcript_cache_path(audio_url):
+    audio_hash = os.path.splitext(os.path.basename(audio_url))[0]
+    return os.path.join(UPLOAD_DIR, f"{audio_hash}.json")
+
+
+def _complete_job(job_id, cache):
+    """Mark a job completed, stashing an ETag for its cached transcript."""
+    hasher = blake3()
+    hasher.update_mmap(cache)
+    update_job(job_id, status="completed", etag=_content_id(hasher))
+
+
 def transcribe_audio_task(job_id, audio_path, audio_hash):
     try:
         cache = os.path.join(UPLOAD_DIR, f"{audio_hash}.json")
         if os.path.exists(cache):
-            log.info("[%s] Cache hit — loading transcript from %s", job_id, cache)
-            with open(cache) as f:
-                result = json.load(f)
-            segments = result.get("segments", [])
-            log.info("[%s] Loaded %d segment(s) from cache.", job_id, len(segments))
+            log.info("[%s] Cache hit — transcript already at %s", job_id, cache)
         else:
-            duration = _get_audio_duration(audio_path)
+            meta = _get_audio_meta(audio_path, audio_hash)
+            duration = meta["duration"]
             if duration:
                 log.info("[%s] Audio duration: %.0fs", job_id, duration)
             else:
                 log.info("[%s] Could not determine audio duration", job_id)
 
-            if duration and duration > CHUNK_DURATION:
-                log.info("[%s] Long file (%.0fs), using chunked transcription", job_id, duration)
-                result = _transcribe_chunked(job_id, audio_path, audio_hash)
-            else:
-                log.info("[%s] Starting Whisper transcription of: %s", job_id, audio_path)
-                result = model.transcribe(audio_path, word_timestamps=True, fp16=False)
-
-            segments = result.get("segments", [])
-            log.info("[%s] Transcription complete. %d segment(s).", job_id, len(segments))
-            with open(cache, "w") as f:
-                json.dump(result, f)
+            # Write to a per-job temp file, then rename, so readers never see
+            # a half-written cache and concurrent jobs don't clobber each other
+            tmp_path = f"{cache}.{job_id}.tmp"
+            try:
+                if meta["chunked"]:
+                    log.info("[%s] Long file (%.0fs), using chunked transcription", job_id, duration)
+                    n_segments = _transcribe_chunked(job_id, audio_path, tmp_path)
+                else:
+                    log.info("[%s] Starting batched Whisper transcription of: %s", job_id, audio_path)
+                    result = _transcribe(audio_path, batched=True)
+                    n_segments = len(result["segments"])
+                    with open(tmp_path, "wb") as f:
+                        f.write(orjson.dumps(result, option=ORJSON_OPTS))
+                log.info("[%s] Transcription complete. %d segment(s).", job_id, n_segments)
+                os.replace(tmp_path, cache)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
             log.info("[%s] Transcript cached at %s", job_id, cache)
 
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["result"] = {"segments": segments}
-        save_jobs()
+        _complete_job(job_id, cache)
         log.info("[%s] Job completed.", job_id)
     except Exception as e:
         log.error("[%s] Transcription error: %s", job_id, e)
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = str(e)
-        save_jobs()
+        update_job(job_id, status="error", error=str(e))
 
 
 @app.get("/", response_class=FileResponse)
@@ -180,21 +431,32 @@ async def health():
     return {"status": "ok"}
 
 
+def _read_into(f, buf):
+    """f.readinto(buf), for file objects that lack it (SpooledTemporaryFile
+    before Python 3.11)."""
+    data = f.read(len(buf))
+    buf[:len(data)] = data
+    return len(data)
+
+
 def _stream_to_temp(upload_file, dest_dir, max_size):
-    """Stream an UploadFile to a temp file on disk, computing MD5 along the way.
+    """Stream an UploadFile to a temp file on disk, computing BLAKE3 along the way.
     Returns (tmp_path, hex_digest, total_bytes). Raises HTTPException if empty."""
-    md5 = hashlib.md5()
+    hasher = blake3()
     total = 0
+    buf = bytearray(UPLOAD_BUFFER_SIZE)
+    view = memoryview(buf)
+    readinto = getattr(upload_file.file, "readinto", None) or functools.partial(_read_into, upload_file.file)
     tmp_fd, tmp_path = tempfile.mkstemp(dir=dest_dir)
     try:
         with os.fdopen(tmp_fd, "wb") as out:
             while True:
-                chunk = upload_file.file.read(1024 * 1024)
-                if not chunk:
+                n = readinto(buf)
+                if not n:
                     break
-                out.write(chunk)
-                md5.update(chunk)
-                total += len(chunk)
+                out.write(view[:n])
+                hasher.update(view[:n])
+                total += n
                 if total > max_size:
                     os.unlink(tmp_path)
                     raise HTTPException(
@@ -207,16 +469,74 @@ def _stream_to_temp(upload_file, dest_dir, max_size):
     if total == 0:
         os.unlink(tmp_path)
         raise HTTPException(400, f"{upload_file.filename} is empty")
-    return tmp_path, md5.hexdigest(), total
+    return tmp_path, _content_id(hasher), total
+
+
+def _pdf_looks_valid(pdf_path):
+    """Cheap trailer sanity check: %%EOF present and startxref pointing at
+    an xref table or xref stream object inside the file."""
+    size = os.path.getsize(pdf_path)
+    with open(pdf_path, "rb") as f:
+        f.seek(max(0, size - 1024))
+        tail = f.read()
+        match = re.search(rb"startxref\s+(\d+)\s+%%EOF\s*$", tail)
+        if not match or int(match.group(1)) >= size:
+            return False
+        f.seek(int(match.group(1)))
+        head = f.read(32)
+    return head.startswith(b"xref") or re.match(rb"\d+\s+\d+\s+obj", head) is not None
+
+
+def repair_pdf(job_id, pdf_path):
+    try:
+        pdf = pikepdf.open(pdf_path, allow_overwriting_input=True)
+        pdf.save(pdf_path, linearize=True)
+        pdf.close()
+        log.info("[%s] Repaired PDF: %d bytes", job_id, os.path.getsize(pdf_path))
+    except Exception as e:
+        log.warning("[%s] PDF repair failed (%s), serving original", job_id, e)
+
+
+def _move_into_place(src, dst):
+    """Move src to dst. Temp files live in UPLOAD_DIR so this is normally a
+    plain rename; across filesystems, copy in-kernel with copy_file_range."""
+    try:
+        os.rename(src, dst)
+        return
+    except OSError:
+        pass
+    try:
+        remaining = os.path.getsize(src)
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            while remaining > 0:
+                copied = os.copy_file_range(s.fileno(), d.fileno(), remaining)
+                if copied == 0:
+                    raise OSError("copy_file_range made no progress")
+                remaining -= copied
+    except (AttributeError, OSError):
+        # No copy_file_range on this platform/kernel: userspace copy
+        shutil.copyfile(src, dst)
+    os.unlink(src)
 
 
 @app.post("/upload")
 async def upload(background_tasks: BackgroundTasks, pdf_file: UploadFile = File(...), audio_file: UploadFile = File(...)):
     job_id = str(uuid.uuid4())
 
-    # Stream files to disk — never hold full file in RAM
-    pdf_tmp, pdf_hash, pdf_size = _stream_to_temp(pdf_file, UPLOAD_DIR, MAX_PDF_SIZE)
-    audio_tmp, audio_hash, audio_size = _stream_to_temp(audio_file, UPLOAD_DIR, MAX_AUDIO_SIZE)
+    # Stream files to disk — never hold full file in RAM. Both run on worker
+    # threads concurrently so the event loop keeps serving other requests.
+    pdf_res, audio_res = await asyncio.gather(
+        anyio.to_thread.run_sync(_stream_to_temp, pdf_file, UPLOAD_DIR, MAX_PDF_SIZE),
+        anyio.to_thread.run_sync(_stream_to_temp, audio_file, UPLOAD_DIR, MAX_AUDIO_SIZE),
+        return_exceptions=True,
+    )
+    for res, other in ((pdf_res, audio_res), (audio_res, pdf_res)):
+        if isinstance(res, BaseException):
+            if not isinstance(other, BaseException):
+                os.unlink(other[0])
+            raise res
+    pdf_tmp, pdf_hash, pdf_size = pdf_res
+    audio_tmp, audio_hash, audio_size = audio_res
 
     pdf_ext = os.path.splitext(pdf_file.filename)[1] or ".pdf"
     audio_ext = os.path.splitext(audio_file.filename)[1] or ".mp3"
@@ -231,40 +551,32 @@ async def upload(background_tasks: BackgroundTasks, pdf_file: UploadFile = File(
         os.unlink(pdf_tmp)
         log.info("[%s] PDF already on disk, skipping write", job_id)
     else:
-        shutil.move(pdf_tmp, pdf_path)
-        try:
-            pdf = pikepdf.open(pdf_path, allow_overwriting_input=True)
-            pdf.save(pdf_path, linearize=True)
-            pdf.close()
-            log.info("[%s] Saved & repaired PDF: %d bytes", job_id, os.path.getsize(pdf_path))
-        except Exception as e:
-            log.warning("[%s] PDF repair failed (%s), serving original", job_id, e)
+        _move_into_place(pdf_tmp, pdf_path)
+        log.info("[%s] Saved PDF: %d bytes", job_id, pdf_size)
+        if not _pdf_looks_valid(pdf_path):
+            log.info("[%s] PDF trailer looks damaged, queuing repair", job_id)
+            background_tasks.add_task(repair_pdf, job_id, pdf_path)
 
     if os.path.exists(audio_path):
         os.unlink(audio_tmp)
         log.info("[%s] Audio already on disk, skipping write", job_id)
     else:
-        shutil.move(audio_tmp, audio_path)
+        _move_into_place(audio_tmp, audio_path)
         log.info("[%s] Saved audio: %d bytes", job_id, audio_size)
 
-    jobs[job_id] = {
-        "id": job_id,
-        "status": "processing",
-        "pdf_url": f"/uploads/{pdf_name}",
-        "audio_url": f"/uploads/{audio_name}",
-        "title": os.path.splitext(audio_file.filename)[0],
-        "result": None,
-    }
-    save_jobs()
+    create_job(
+        job_id,
+        status="processing",
+        pdf_url=f"/uploads/{pdf_name}",
+        audio_url=f"/uploads/{audio_name}",
+        title=os.path.splitext(audio_file.filename)[0],
+    )
 
     # Check transcript cache — skip background task if already transcribed
     cache = os.path.join(UPLOAD_DIR, f"{audio_hash}.json")
     if os.path.exists(cache):
         log.info("[%s] Cached transcript found.", job_id)
-        with open(cache) as f:
-            jobs[job_id]["result"] = json.load(f)
-        jobs[job_id]["status"] = "completed"
-        save_jobs()
+        _complete_job(job_id, cache)
     else:
         log.info("[%s] Queuing transcription for %s", job_id, audio_name)
         background_tasks.add_task(transcribe_audio_task, job_id, audio_path, audio_hash)
@@ -274,30 +586,48 @@ async def upload(background_tasks: BackgroundTasks, pdf_file: UploadFile = File(
 
 @app.get("/status/{job_id}")
 async def status(job_id: str):
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         raise HTTPException(404, "Job not found")
 
-    job = jobs[job_id]
     if job["status"] == "completed":
-        return {"status": "completed", "pdf_url": job["pdf_url"], "audio_url": job["audio_url"], "title": job["title"], "transcript": job["result"]}
+        return {"status": "completed", "etag": job["etag"], "pdf_url": job["pdf_url"], "audio_url": job["audio_url"], "title": job["title"]}
     if job["status"] == "error":
-        return {"status": "error", "error_msg": job.get("error", "Unknown")}
+        return {"status": "error", "error_msg": job["error"] or "Unknown"}
     return {"status": "processing"}
 
+
+@app.get("/transcript/{job_id}")
+async def transcript(job_id: str, request: Request):
+    """Serve the cached transcript file for a completed job."""
+    job = get_job(job_id)
+    if job is None or job["status"] != "completed":
+        raise HTTPException(404, "Transcript not found")
+    cache = _transcript_cache_path(job["audio_url"])
+    if not os.path.exists(cache):
+        raise HTTPException(404, "Transcript not found")
+    if job["etag"] is None:
+        # Jobs completed before ETags were recorded
+        _complete_job(job_id, cache)
+        job = get_job(job_id)
+
+    etag = f'"{job["etag"]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return FileResponse(cache, media_type="application/json", headers={"ETag": etag})
+
 @app.get("/history")
 async def get_history():
     """Returns all completed jobs."""
-    completed = []
-    for jid, job in jobs.items():
-        if job["status"] == "completed":
-            completed.append({
-                "id": jid,
-                "title": job.get("title", "Unknown"),
-                "pdf_url": job["pdf_url"],
-                "audio_url": job["audio_url"]
-            })
-    return list(reversed(completed))
-
+    with db_lock:
+        rows = db.execute(
+            "SELECT id, title, pdf_url, audio_url FROM jobs"
+            " WHERE status = 'completed' ORDER BY created DESC"
+        ).fetchall()
+    return [
+        {"id": r["id"], "title": r["title"] or "Unknown", "pdf_url": r["pdf_url"], "audio_url": r["audio_url"]}
+        for r in rows
+    ]
 
 if __name__ == "__main__":
     import uvicorn
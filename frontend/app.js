@@ -75,11 +75,19 @@ document.addEventListener('DOMContentLoaded', () => {
             const d = await res.json();
             if (d.status === 'completed') {
                 clearInterval(poll);
+                const tr = await fetch('/transcript/' + id).catch(() => null);
+                if (!tr?.ok) {
+                    setStatus('Error', 'error');
+                    uploadBtn.disabled = false;
+                    uploadBtn.classList.remove('loading');
+                    return;
+                }
+                const transcript = await tr.json();
                 setStatus('Ready', 'ready');
                 uploadBtn.disabled = false;
                 uploadBtn.classList.remove('loading');
                 currentJobId = id;
-                show(d.pdf_url, d.audio_url, d.transcript, d.title);
+                show(d.pdf_url, d.audio_url, transcript, d.title);
             } else if (d.status === 'error') {
                 clearInterval(poll);
                 setStatus('Error', 'error');